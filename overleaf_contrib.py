@@ -25,15 +25,81 @@ To get your session cookie:
 """
 
 import argparse
+import asyncio
 import json
 import re
-import requests
+import shelve
+import sqlite3
 import sys
-import time
+import threading
+
+try:
+    # Drop-in replacement for requests with HTTP/2 multiplexing, so many
+    # GETs share a single TCP+TLS connection instead of serializing.
+    import niquests as requests
+    _HAS_NIQUESTS = True
+except ImportError:
+    import requests
+    _HAS_NIQUESTS = False
+
+if not _HAS_NIQUESTS:
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # Falls back to serial fetching via requests
+
+try:
+    # Optional: vectorized classification of large histories
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = None
+    pd = None
+
+try:
+    # Optional: JIT-compiled DFA matching for complex --file-pattern
+    # regexes over very large path sets
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    # Optional: stream-parse history files instead of loading them whole
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    # Optional: C-level JSON encoding/decoding
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional: compiled classify/accumulate kernel for huge histories
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    # Optional: brotli response decoding (requests/urllib3 and aiohttp
+    # both accept either the brotli or the brotlicffi package)
+    import brotli  # noqa: F401
+    _HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _HAS_BROTLI = True
+    except ImportError:
+        _HAS_BROTLI = False
+
 # SAFETY: Only these read-only endpoints are allowed
 ALLOWED_ENDPOINTS = frozenset([
     '/updates',  # GET project update history
@@ -42,25 +108,120 @@ ALLOWED_ENDPOINTS = frozenset([
 
 BASE_URL = "https://www.overleaf.com"
 
+# Max concurrent /diff requests when fetching asynchronously
+ASYNC_CONCURRENCY = 10
 
-def safe_get(session, project_id, endpoint, params=None):
+# Files processed in parallel during analyze; per-file fetch concurrency is
+# divided down so total in-flight requests stay capped at ASYNC_CONCURRENCY
+MAX_FILE_WORKERS = 4
+
+# Serializes access to the shelve-backed diff cache across file workers
+_cache_lock = threading.Lock()
+
+# Below this many paths, compiling a Hyperscan database costs more than it saves
+HYPERSCAN_MIN_PATHS = 10000
+
+
+class UserFileStats:
     """
-    Perform a safe GET request - only allows whitelisted read-only endpoints.
+    Per-(file, user) contribution totals.
 
-    SAFETY: This function will REFUSE to call any endpoint not in ALLOWED_ENDPOINTS.
+    A plain __slots__ class rather than a dict record: no per-instance
+    __dict__, so each record is a fixed small object with direct attribute
+    access in the aggregation loops. (Not a dataclass(slots=True) to keep
+    the Python 3.7 floor.)
+    """
+
+    __slots__ = ('name', 'email',
+                 'new_content_chars', 'new_content_updates',
+                 'rewriting_ins_chars', 'rewriting_del_chars',
+                 'rewriting_updates', 'deletion_only_chars')
+
+    def __init__(self):
+        self.name = None
+        self.email = None
+        self.new_content_chars = 0
+        self.new_content_updates = 0
+        self.rewriting_ins_chars = 0
+        self.rewriting_del_chars = 0
+        self.rewriting_updates = 0
+        self.deletion_only_chars = 0
+
+
+# Display names cached by user id so the hot loops don't rebuild the
+# same string for every diff item / update
+_name_cache = {}
+
+
+def user_id_of(user):
+    """
+    User id for a user dict, interned.
+
+    Ids arrive as fresh str objects from every parsed diff; interning them
+    makes the many dict lookups keyed on user_id hash/compare by identity.
+    """
+    return sys.intern(user.get('id', 'unknown'))
+
+
+def name_of(user):
+    """Display name ("First Last") for a user dict, cached by user id."""
+    user_id = user_id_of(user)
+    name = _name_cache.get(user_id)
+    if name is None:
+        name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
+        _name_cache[user_id] = name
+    return name
+
+
+def safe_url(project_id, endpoint):
+    """
+    Build the URL for a whitelisted read-only endpoint.
+
+    SAFETY: This function will REFUSE to build a URL for any endpoint not in
+    ALLOWED_ENDPOINTS, so every fetch path (sync or async) shares the same
+    guarantee.
     """
     if endpoint not in ALLOWED_ENDPOINTS:
         raise ValueError(f"SAFETY: Endpoint '{endpoint}' not in whitelist: {ALLOWED_ENDPOINTS}")
+    return f"{BASE_URL}/project/{project_id}{endpoint}"
+
+
+def json_loads(data):
+    """Decode JSON bytes with orjson when installed, stdlib json otherwise."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
-    url = f"{BASE_URL}/project/{project_id}{endpoint}"
+
+def safe_get(session, project_id, endpoint, params=None):
+    """
+    Perform a safe GET request - only allows whitelisted read-only endpoints.
+
+    SAFETY: This function will REFUSE to call any endpoint not in ALLOWED_ENDPOINTS.
+    """
+    url = safe_url(project_id, endpoint)
     response = session.get(url, params=params)
     response.raise_for_status()
-    return response.json()
+    return json_loads(response.content)
 
 
 def create_session(cookie):
     """Create a requests session with proper headers."""
-    session = requests.Session()
+    if _HAS_NIQUESTS:
+        session = requests.Session(multiplexed=True)
+    else:
+        session = requests.Session()
+        # Default pools (10 connections) throttle the concurrent fetch
+        # paths; retries honor Retry-After on 429 and back off on
+        # transient gateway errors. 500 is deliberately not retried:
+        # fetch_diff interprets it as "diff too large".
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=64,
+            max_retries=Retry(total=5, backoff_factor=0.3,
+                              status_forcelist=[429, 502, 503, 504]),
+        )
+        session.mount('https://', adapter)
 
     # Handle both full Cookie header and just the session value
     if 'overleaf_session2=' in cookie:
@@ -70,6 +231,13 @@ def create_session(cookie):
 
     session.headers['User-Agent'] = 'Mozilla/5.0 (compatible; OverleafContribStats)'
     session.headers['Accept'] = 'application/json'
+    # Diff JSON compresses very well; ask for compressed bodies to cut
+    # time-on-wire. Only advertise br when a brotli decoder is actually
+    # installed - otherwise brotli-encoded responses would be undecodable.
+    if _HAS_BROTLI:
+        session.headers['Accept-Encoding'] = 'br, gzip, deflate'
+    else:
+        session.headers['Accept-Encoding'] = 'gzip, deflate'
 
     return session
 
@@ -83,25 +251,36 @@ def fetch_all_updates(session, project_id, max_pages=100):
     all_updates = []
     before = None
 
-    for page in range(max_pages):
-        params = {}
-        if before:
-            params['before'] = before
+    def get_page(before):
+        params = {'before': before} if before else {}
+        return safe_get(session, project_id, '/updates', params)
+
+    # Each page's request depends on the previous page's nextBeforeTimestamp
+    # cursor, so pages cannot be fetched fully in parallel. Instead, issue
+    # the next request on a worker thread as soon as the cursor is known,
+    # overlapping its network wait with processing of the current page.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(get_page, before)
+
+        for page in range(max_pages):
+            print(f"Fetching updates page {page + 1}...", file=sys.stderr)
 
-        print(f"Fetching updates page {page + 1}...", file=sys.stderr)
+            data = future.result()
 
-        data = safe_get(session, project_id, '/updates', params)
+            updates = data.get('updates', [])
+            if not updates:
+                break
 
-        updates = data.get('updates', [])
-        if not updates:
-            break
+            next_before = data.get('nextBeforeTimestamp')
+            advancing = next_before and next_before != before
+            if advancing and page + 1 < max_pages:
+                before = next_before
+                future = pool.submit(get_page, before)
 
-        all_updates.extend(updates)
+            all_updates.extend(updates)
 
-        next_before = data.get('nextBeforeTimestamp')
-        if not next_before or next_before == before:
-            break
-        before = next_before
+            if not advancing:
+                break
 
     print(f"Fetched {len(all_updates)} total updates", file=sys.stderr)
     return all_updates
@@ -119,41 +298,205 @@ def fetch_diff(session, project_id, from_v, to_v, pathname):
         raise
 
 
+async def fetch_diff_async(session, project_id, from_v, to_v, pathname, sem):
+    """
+    Fetch diff for a specific file between versions (async variant).
+
+    Concurrency is bounded by the shared semaphore; HTTP 429 responses are
+    retried with exponential backoff instead of a fixed sleep.
+    """
+    url = safe_url(project_id, '/diff')
+    params = {'from': from_v, 'to': to_v, 'pathname': pathname}
+
+    async with sem:
+        for attempt in range(5):
+            async with session.get(url, params=params) as response:
+                if response.status == 429:
+                    await asyncio.sleep(0.5 * (2 ** attempt))
+                    continue
+                if response.status == 500:
+                    return None  # Diff too large or server error
+                response.raise_for_status()
+                data = json_loads(await response.read())
+                return data.get('diff', [])
+        return None  # Still rate-limited after retries
+
+
+async def _gather_file_diffs(headers, project_id, pathname, version_pairs,
+                             concurrency=ASYNC_CONCURRENCY):
+    """Fetch all diffs for one file concurrently via a shared aiohttp session."""
+    sem = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession(headers=headers) as session:
+        tasks = [
+            fetch_diff_async(session, project_id, from_v, to_v, pathname, sem)
+            for from_v, to_v in version_pairs
+        ]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _fetch_file_diffs_serial(session, project_id, pathname, version_pairs):
+    """Serial fallback for fetch_file_diffs when aiohttp is not installed."""
+    results = []
+    for from_v, to_v in version_pairs:
+        try:
+            results.append(fetch_diff(session, project_id, from_v, to_v, pathname))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def fetch_file_diffs(session, project_id, pathname, version_pairs, cache=None,
+                     concurrency=ASYNC_CONCURRENCY):
+    """
+    Fetch diffs for one file across many (fromV, toV) ranges.
+
+    Uses aiohttp to issue the requests concurrently when available; otherwise
+    falls back to a serial requests loop, where rate limiting is left to the
+    session adapter's retry/backoff (see create_session). Returns a list
+    aligned with version_pairs where each entry is the diff list, None (the
+    server could not produce the diff), or an Exception.
+
+    A (fromV, toV, pathname) diff is immutable, so when a cache mapping is
+    given, hits are served from it and only misses go over the network.
+    Cache access is serialized so this function is safe to call from
+    several file workers at once.
+    """
+    results = {}
+    misses = []
+    with _cache_lock:
+        for i, (from_v, to_v) in enumerate(version_pairs):
+            key = f"{from_v}:{to_v}:{pathname}"
+            if cache is not None and key in cache:
+                results[i] = cache[key]
+            else:
+                misses.append(i)
+
+    if misses:
+        miss_pairs = [version_pairs[i] for i in misses]
+        if aiohttp is not None:
+            headers = dict(session.headers)
+            fetched = asyncio.run(
+                _gather_file_diffs(headers, project_id, pathname, miss_pairs, concurrency))
+        else:
+            fetched = _fetch_file_diffs_serial(session, project_id, pathname, miss_pairs)
+
+        with _cache_lock:
+            for i, diff in zip(misses, fetched):
+                results[i] = diff
+                if cache is not None and isinstance(diff, list):
+                    from_v, to_v = version_pairs[i]
+                    cache[f"{from_v}:{to_v}:{pathname}"] = diff
+
+    return [results[i] for i in range(len(version_pairs))]
+
+
 def analyze_diff(diff):
     """
     Analyze a diff to extract per-user insertions and deletions.
 
     Returns dict: {user_id: {name, email, ins_chars, del_chars}}
     """
-    user_stats = defaultdict(lambda: {
-        'name': None,
-        'email': None,
-        'ins_chars': 0,
-        'del_chars': 0,
-    })
+    # Hot loop for large diffs: one pass, one lookup per item, per-user
+    # totals in a small [name, email, ins, dels] list instead of a dict.
+    user_stats = {}
+    user_stats_get = user_stats.get
 
     for item in diff:
         if 'i' in item:
+            is_insert = True
             text = item['i']
-            users = item.get('meta', {}).get('users', [])
-            if users and users[0]:
-                user = users[0]
-                user_id = user.get('id', 'unknown')
-                user_stats[user_id]['name'] = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
-                user_stats[user_id]['email'] = user.get('email')
-                user_stats[user_id]['ins_chars'] += len(text)
-
         elif 'd' in item:
+            is_insert = False
             text = item['d']
-            users = item.get('meta', {}).get('users', [])
-            if users and users[0]:
-                user = users[0]
-                user_id = user.get('id', 'unknown')
-                user_stats[user_id]['name'] = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
-                user_stats[user_id]['email'] = user.get('email')
-                user_stats[user_id]['del_chars'] += len(text)
+        else:
+            continue
 
-    return dict(user_stats)
+        users = item.get('meta', {}).get('users', [])
+        if not (users and users[0]):
+            continue
+
+        user = users[0]
+        user_id = user_id_of(user)
+        record = user_stats_get(user_id)
+        if record is None:
+            record = [name_of(user), user.get('email'), 0, 0]
+            user_stats[user_id] = record
+
+        if is_insert:
+            record[2] += len(text)
+        else:
+            record[3] += len(text)
+
+    return {
+        user_id: {'name': rec[0], 'email': rec[1],
+                  'ins_chars': rec[2], 'del_chars': rec[3]}
+        for user_id, rec in user_stats.items()
+    }
+
+
+def compose_diffs(first, second):
+    """
+    Compose two adjacent diffs into one covering the combined range.
+
+    ``first`` must describe versions A -> B and ``second`` B -> C; the
+    result describes A -> C the way a direct /diff call would, with each
+    insert/delete keeping the meta (and thus user attribution) of the diff
+    it came from. Text inserted by ``first`` and deleted again by
+    ``second`` cancels out. This lets wider time windows be derived
+    locally from already-fetched per-update diffs instead of spending one
+    /diff round-trip per composed range.
+    """
+    # Expand first into (kind, remaining_text, item) ops; second consumes
+    # first's output ('u'/'i' text) while first's deletes pass straight through
+    first_ops = [(k, item[k], item)
+                 for item in first for k in ('u', 'i', 'd') if k in item]
+    result = []
+
+    def emit(kind, text, meta_item):
+        if not text:
+            return
+        item = {kind: text}
+        if meta_item is not None and 'meta' in meta_item:
+            item['meta'] = meta_item['meta']
+        result.append(item)
+
+    fi = 0
+    for item2 in second:
+        if 'i' in item2:
+            emit('i', item2['i'], item2)
+            continue
+
+        kind2 = 'u' if 'u' in item2 else 'd'
+        need = len(item2[kind2])
+        while need > 0 and fi < len(first_ops):
+            kind1, text1, item1 = first_ops[fi]
+            if kind1 == 'd':
+                emit('d', text1, item1)
+                fi += 1
+                continue
+
+            take = min(need, len(text1))
+            chunk = text1[:take]
+            if kind1 == 'u':
+                # Unchanged text either stays unchanged or gets deleted now
+                emit(kind2, chunk, item2 if kind2 == 'd' else None)
+            elif kind2 == 'u':
+                emit('i', chunk, item1)
+            # else: inserted by first, deleted by second -> cancels
+
+            if take == len(text1):
+                fi += 1
+            else:
+                first_ops[fi] = (kind1, text1[take:], item1)
+            need -= take
+
+    # Trailing ops of first (normally just deletes at the end of the range)
+    while fi < len(first_ops):
+        kind1, text1, item1 = first_ops[fi]
+        emit(kind1, text1, None if kind1 == 'u' else item1)
+        fi += 1
+
+    return result
 
 
 def classify_update_contribution(diff_stats):
@@ -191,17 +534,351 @@ def classify_update_contribution(diff_stats):
     return classified
 
 
+def _flatten_diff_rows(diffs):
+    """
+    Flatten the diff items of one file's fetched updates into rows.
+
+    Returns ([(update_idx, user_id, ins_chars, del_chars), ...],
+    {user_id: (name, email)}). Failed fetches (None/Exception entries)
+    are skipped.
+    """
+    rows = []
+    user_info = {}
+    for idx, diff in enumerate(diffs):
+        if diff is None or isinstance(diff, Exception):
+            continue
+        for item in diff:
+            if 'i' in item:
+                n_ins, n_del = len(item['i']), 0
+            elif 'd' in item:
+                n_ins, n_del = 0, len(item['d'])
+            else:
+                continue
+
+            users = item.get('meta', {}).get('users', [])
+            if not (users and users[0]):
+                continue
+
+            user = users[0]
+            user_id = user_id_of(user)
+            if user_id not in user_info:
+                user_info[user_id] = (name_of(user), user.get('email'))
+            rows.append((idx, user_id, n_ins, n_del))
+
+    return rows, user_info
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _accumulate_kernel(user_idx, ins, dels, n_users):
+        """Classify each (update, user) row and accumulate per-user totals."""
+        out = np.zeros((n_users, 6), dtype=np.int64)
+        for i in range(user_idx.shape[0]):
+            u = user_idx[i]
+            a = ins[i]
+            d = dels[i]
+            if a > 0 and d == 0:
+                out[u, 0] += a
+                out[u, 1] += 1
+            elif a > 0 and d > 0:
+                out[u, 2] += a
+                out[u, 3] += d
+                out[u, 4] += 1
+            elif d > 0:
+                out[u, 5] += d
+        return out
+
+
+def accumulate_file_stats(diffs):
+    """
+    Classify and accumulate all of a file's diffs into per-user records.
+
+    Fast path for the post-fetch CPU work: per-(update, user) sums come
+    from one pandas groupby, user ids are factorized to integer indices,
+    and the classification + accumulation runs as a numba-compiled kernel
+    over int64 arrays. Returns {user_id: UserFileStats}, or None when
+    pandas or numba is missing, in which case callers fall back to
+    classify_file_updates.
+    """
+    if pd is None or numba is None:
+        return None
+
+    rows, user_info = _flatten_diff_rows(diffs)
+    out = {}
+    if not rows:
+        return out
+
+    df = pd.DataFrame(rows, columns=['update_idx', 'user_id', 'ins', 'dels'])
+    sums = df.groupby(['update_idx', 'user_id'], sort=False).sum().reset_index()
+    user_idx, unique_users = pd.factorize(sums['user_id'])
+    acc = _accumulate_kernel(user_idx.astype(np.int64),
+                             sums['ins'].to_numpy(np.int64),
+                             sums['dels'].to_numpy(np.int64),
+                             len(unique_users))
+
+    for idx, user_id in enumerate(unique_users):
+        rec = UserFileStats()
+        rec.name, rec.email = user_info[user_id]
+        (rec.new_content_chars, rec.new_content_updates,
+         rec.rewriting_ins_chars, rec.rewriting_del_chars, rec.rewriting_updates,
+         rec.deletion_only_chars) = (int(v) for v in acc[idx])
+        out[user_id] = rec
+
+    return out
+
+
+def classify_file_updates(diffs):
+    """
+    Classify every fetched update of a file in one shot.
+
+    Takes the list returned by fetch_file_diffs and returns a list of the
+    same length where each entry is the classify_update_contribution()
+    result for that update, or None for failed fetches.
+
+    When pandas is available, the per-item Python loops are replaced by one
+    DataFrame groupby over all diff items of the file plus a single
+    vectorized np.select classification, so histories with millions of
+    insert/delete fragments are reduced at C level.
+    """
+    out = [None if diff is None or isinstance(diff, Exception) else {}
+           for diff in diffs]
+
+    if pd is None:
+        for idx, diff in enumerate(diffs):
+            if out[idx] is not None:
+                out[idx] = classify_update_contribution(analyze_diff(diff))
+        return out
+
+    rows, user_info = _flatten_diff_rows(diffs)
+    if not rows:
+        return out
+
+    df = pd.DataFrame(rows, columns=['update_idx', 'user_id', 'ins', 'dels'])
+    sums = df.groupby(['update_idx', 'user_id'], sort=False).sum()
+    ins = sums['ins'].to_numpy()
+    dels = sums['dels'].to_numpy()
+    contrib_type = np.select(
+        [(ins > 0) & (dels == 0), (ins > 0) & (dels > 0), dels > 0],
+        ['new_content', 'rewriting', 'deletion_only'],
+        default='',
+    )
+
+    for (idx, user_id), ctype, n_ins, n_del in zip(sums.index, contrib_type, ins, dels):
+        if not ctype:
+            continue
+        name, email = user_info[user_id]
+        out[idx][user_id] = {
+            'name': name,
+            'email': email,
+            'type': ctype,
+            'ins_chars': int(n_ins),
+            'del_chars': int(n_del),
+        }
+
+    return out
+
+
+def filter_paths(paths, file_pattern=None):
+    """
+    Filter an iterable of unique pathnames by a regex, returning a sorted list.
+
+    Complex patterns (e.g. alternations like "\\.(tex|bib|cls)$") make
+    Python's backtracking re engine CPU-bound on huge path sets, so when
+    hyperscan is installed and there are enough paths to amortize compiling
+    its DFA, matching is done there instead.
+    """
+    paths = set(paths)
+    if not file_pattern:
+        return sorted(paths)
+
+    if hyperscan is not None and len(paths) >= HYPERSCAN_MIN_PATHS:
+        # Hyperscan rejects constructs re accepts (lookaround,
+        # backreferences, ...); on any failure fall through to re below
+        try:
+            db = hyperscan.Database()
+            db.compile(expressions=[file_pattern.encode()],
+                       flags=[hyperscan.HS_FLAG_SINGLEMATCH])
+
+            matched = []
+
+            def on_match(expr_id, start, end, flags, path):
+                matched.append(path)
+
+            for path in paths:
+                db.scan(path.encode(), match_event_handler=on_match, context=path)
+            return sorted(matched)
+        except Exception:
+            pass
+
+    pattern = re.compile(file_pattern)
+    return sorted(p for p in paths if pattern.search(p))
+
+
 def get_files_from_updates(updates, file_pattern=None):
     """Extract unique file paths from updates, optionally filtered by pattern."""
-    files = set()
+    paths = set()
     for update in updates:
-        for path in update.get('pathnames', []):
-            if file_pattern:
-                if re.search(file_pattern, path):
-                    files.add(path)
-            else:
-                files.add(path)
-    return sorted(files)
+        paths.update(update.get('pathnames', []))
+    return filter_paths(paths, file_pattern)
+
+
+def process_file(session, project_id, filename, file_updates, diff_cache,
+                 concurrency=ASYNC_CONCURRENCY):
+    """
+    Fetch and aggregate all of one file's updates.
+
+    Returns ({user_id: stats record}, success, failed, error_messages).
+    Safe to run from several worker threads at once: it only touches the
+    session headers, the lock-guarded diff cache, and local state.
+    """
+    version_pairs = [(u['fromV'], u['toV']) for u in file_updates]
+    diffs = fetch_file_diffs(session, project_id, filename, version_pairs,
+                             cache=diff_cache, concurrency=concurrency)
+
+    success = 0
+    failed = 0
+    errors = []
+    for (from_v, to_v), diff in zip(version_pairs, diffs):
+        if diff is None or isinstance(diff, Exception):
+            failed += 1
+            if isinstance(diff, Exception):
+                errors.append(f"v{from_v}-v{to_v}: {diff}")
+        else:
+            success += 1
+
+    # Fast path: classify + accumulate the whole file in one compiled
+    # kernel when pandas and numba are available
+    per_user = accumulate_file_stats(diffs)
+
+    if per_user is None:
+        per_user = {}
+        for classified in classify_file_updates(diffs):
+            if not classified:
+                continue
+            for user_id, contrib in classified.items():
+                rec = per_user.get(user_id)
+                if rec is None:
+                    rec = per_user[user_id] = UserFileStats()
+                rec.name = contrib['name'] or rec.name
+                rec.email = contrib['email'] or rec.email
+
+                if contrib['type'] == 'new_content':
+                    rec.new_content_chars += contrib['ins_chars']
+                    rec.new_content_updates += 1
+                elif contrib['type'] == 'rewriting':
+                    rec.rewriting_ins_chars += contrib['ins_chars']
+                    rec.rewriting_del_chars += contrib['del_chars']
+                    rec.rewriting_updates += 1
+                elif contrib['type'] == 'deletion_only':
+                    rec.deletion_only_chars += contrib['del_chars']
+
+    return per_user, success, failed, errors
+
+
+def open_stats_db(project_id):
+    """
+    Open (creating if needed) the per-project contribution stats database.
+
+    Per-file results are persisted here as soon as each file finishes, so
+    memory stays bounded for long runs and an interrupted analyze can
+    resume without re-processing completed files.
+    """
+    conn = sqlite3.connect(f"contrib_{project_id}.db")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stats (
+            filename TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            name TEXT,
+            email TEXT,
+            new_content_chars INTEGER NOT NULL,
+            new_content_updates INTEGER NOT NULL,
+            rewriting_ins_chars INTEGER NOT NULL,
+            rewriting_del_chars INTEGER NOT NULL,
+            rewriting_updates INTEGER NOT NULL,
+            deletion_only_chars INTEGER NOT NULL,
+            PRIMARY KEY (filename, user_id)
+        )
+    """)
+    return conn
+
+
+def save_file_stats(conn, filename, per_user):
+    """Replace one file's rows in the stats table with this run's records."""
+    conn.execute("DELETE FROM stats WHERE filename = ?", (filename,))
+    conn.executemany(
+        "INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(filename, user_id,
+          rec.name, rec.email,
+          rec.new_content_chars, rec.new_content_updates,
+          rec.rewriting_ins_chars, rec.rewriting_del_chars, rec.rewriting_updates,
+          rec.deletion_only_chars)
+         for user_id, rec in per_user.items()])
+    conn.commit()
+
+
+# Update fields the analyze path actually needs; everything else in the
+# history file is dropped while streaming
+SLIM_UPDATE_KEYS = ('fromV', 'toV', 'pathnames', 'meta')
+
+
+def dump_update_line(update):
+    """Serialize one update as a single NDJSON line (bytes, newline included)."""
+    if orjson is not None:
+        return orjson.dumps(update) + b"\n"
+    return json.dumps(update, default=str).encode() + b"\n"
+
+
+def _is_ndjson(updates_file):
+    """
+    Detect NDJSON vs legacy {'updates': [...]} history files by content.
+
+    cmd_fetch writes NDJSON whatever --output is named, so the filename
+    extension cannot be trusted. An NDJSON first line is a complete update
+    object; a legacy file either spans lines (pretty-printed, so the first
+    line alone doesn't parse) or parses to the {'updates': ...} wrapper.
+    """
+    with open(updates_file, 'rb') as f:
+        first_line = f.readline()
+    if not first_line.strip():
+        return True  # Empty history; the NDJSON path yields nothing
+    try:
+        first = json_loads(first_line)
+    except ValueError:
+        return False
+    return isinstance(first, dict) and 'updates' not in first
+
+
+def load_updates(updates_file):
+    """
+    Iterate updates from a history file, yielding one slim record at a time.
+
+    Supports both the NDJSON format written by cmd_fetch (one update per
+    line) and legacy {'updates': [...]} JSON files, detected by content.
+    NDJSON and ijson (when installed) keep peak memory at O(one update)
+    instead of O(whole file) - history files for long-lived projects can
+    run to hundreds of MB. Only the SLIM_UPDATE_KEYS fields of each update
+    are kept.
+    """
+    def slim(update):
+        return {k: update[k] for k in SLIM_UPDATE_KEYS if k in update}
+
+    if _is_ndjson(updates_file):
+        with open(updates_file, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield slim(json_loads(line))
+        return
+
+    if ijson is not None:
+        with open(updates_file, 'rb') as f:
+            for update in ijson.items(f, 'updates.item'):
+                yield slim(update)
+        return
+
+    with open(updates_file) as f:
+        data = json.load(f)
+    for update in data['updates']:
+        yield slim(update)
 
 
 def cmd_fetch(args):
@@ -233,19 +910,20 @@ def cmd_fetch(args):
         for user in users:
             if user is None:
                 continue
-            user_id = user.get('id', 'unknown')
-            per_user[user_id]['name'] = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
+            user_id = user_id_of(user)
+            per_user[user_id]['name'] = name_of(user)
             per_user[user_id]['email'] = user.get('email')
 
         if users and users[0]:
-            user_id = users[0].get('id', 'unknown')
+            user_id = user_id_of(users[0])
             per_user[user_id]['updates'] += 1
             per_user[user_id]['files'].update(pathnames)
 
-    # Save raw data
-    output_file = args.output or f"overleaf_history_{args.project_id}.json"
-    with open(output_file, 'w') as f:
-        json.dump({'updates': updates}, f, indent=2, default=str)
+    # Save raw data as NDJSON (one update per line) so analyze can stream it
+    output_file = args.output or f"overleaf_history_{args.project_id}.ndjson"
+    with open(output_file, 'wb') as f:
+        for update in updates:
+            f.write(dump_update_line(update))
     print(f"History saved to: {output_file}", file=sys.stderr)
 
     # Print summary
@@ -263,8 +941,14 @@ def cmd_analyze(args):
     """Analyze command - detailed diff analysis for contribution breakdown."""
     session = create_session(args.cookie)
 
-    # Load updates
-    updates_file = args.updates_file or f"overleaf_history_{args.project_id}.json"
+    # Load updates; prefer the NDJSON output of fetch but keep reading
+    # legacy .json history files
+    updates_file = args.updates_file
+    if not updates_file:
+        updates_file = f"overleaf_history_{args.project_id}.ndjson"
+        legacy_file = f"overleaf_history_{args.project_id}.json"
+        if not Path(updates_file).exists() and Path(legacy_file).exists():
+            updates_file = legacy_file
 
     if not Path(updates_file).exists():
         print(f"Updates file not found: {updates_file}", file=sys.stderr)
@@ -272,18 +956,27 @@ def cmd_analyze(args):
         sys.exit(1)
 
     print(f"Loading updates from {updates_file}...", file=sys.stderr)
-    with open(updates_file) as f:
-        data = json.load(f)
-    updates = data['updates']
 
+    # One streaming pass over the history: build the path -> updates
+    # reverse index without materializing the full update list
+    updates_by_path = defaultdict(list)
+    n_updates = 0
+    for update in load_updates(updates_file):
+        n_updates += 1
+        for path in update.get('pathnames', ()):
+            updates_by_path[path].append(update)
+
+    print(f"Indexed {n_updates} updates across {len(updates_by_path)} files", file=sys.stderr)
     print("SAFETY: Only using read-only GET requests", file=sys.stderr)
     print("", file=sys.stderr)
 
     # Get files to analyze
     if args.files:
-        target_files = args.files
+        # Dedupe while keeping CLI order so a repeated file isn't fetched
+        # and counted twice
+        target_files = list(dict.fromkeys(args.files))
     else:
-        target_files = get_files_from_updates(updates, args.file_pattern)
+        target_files = filter_paths(updates_by_path.keys(), args.file_pattern)
 
     if not target_files:
         print("No files to analyze. Specify --files or --file-pattern", file=sys.stderr)
@@ -291,78 +984,50 @@ def cmd_analyze(args):
 
     print(f"Analyzing {len(target_files)} files...", file=sys.stderr)
 
-    # Aggregate stats per user per file
-    file_user_stats = defaultdict(lambda: defaultdict(lambda: {
-        'name': None, 'email': None,
-        'new_content_chars': 0,
-        'new_content_updates': 0,
-        'rewriting_ins_chars': 0,
-        'rewriting_del_chars': 0,
-        'rewriting_updates': 0,
-        'deletion_only_chars': 0,
-    }))
-
-    # Process each file
-    for filename in target_files:
-        print(f"\nProcessing {filename}...", file=sys.stderr)
-
-        file_updates = [u for u in updates if filename in u.get('pathnames', [])]
-
+    # Per-file results are flushed to SQLite as they complete, so memory
+    # stays bounded and interrupted runs resume where they left off
+    conn = open_stats_db(args.project_id)
+    done_files = {row[0] for row in
+                  conn.execute("SELECT DISTINCT filename FROM stats")}
+    pending_files = [f for f in target_files if f not in done_files]
+    if len(pending_files) < len(target_files):
+        print(f"Resuming: {len(target_files) - len(pending_files)} files already "
+              f"in contrib_{args.project_id}.db", file=sys.stderr)
+
+    # Diffs between fixed versions never change, so cache them on disk and
+    # serve repeat runs (e.g. with a different --file-pattern) locally.
+    diff_cache = shelve.open(f".diffcache_{args.project_id}")
+
+    # Process files in parallel: each file's fetch is independent, so run
+    # up to MAX_FILE_WORKERS at once while dividing the per-file fetch
+    # concurrency so total in-flight requests stay at ASYNC_CONCURRENCY
+    max_workers = min(MAX_FILE_WORKERS, len(pending_files)) or 1
+    concurrency = max(1, ASYNC_CONCURRENCY // max_workers)
+
+    def worker(filename):
+        file_updates = updates_by_path.get(filename, [])
         if args.sample > 0:
             file_updates = file_updates[:args.sample]
+        return process_file(session, args.project_id, filename, file_updates,
+                            diff_cache, concurrency)
 
-        print(f"  {len(file_updates)} updates to process", file=sys.stderr)
-
-        success = 0
-        failed = 0
-
-        for i, update in enumerate(file_updates):
-            from_v = update['fromV']
-            to_v = update['toV']
-
-            if i > 0 and i % 10 == 0:
-                time.sleep(0.5)
-
-            try:
-                diff = fetch_diff(session, args.project_id, from_v, to_v, filename)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for filename, (per_user, success, failed, errors) in zip(
+                pending_files, pool.map(worker, pending_files)):
+            print(f"\n{filename}: {success + failed} updates, "
+                  f"{success} successful, {failed} failed", file=sys.stderr)
+            if args.verbose:
+                for msg in errors:
+                    print(f"    Error on {msg}", file=sys.stderr)
 
-                if diff is None:
-                    failed += 1
-                    continue
-
-                diff_stats = analyze_diff(diff)
-                classified = classify_update_contribution(diff_stats)
-
-                for user_id, contrib in classified.items():
-                    fus = file_user_stats[filename][user_id]
-                    fus['name'] = contrib['name'] or fus['name']
-                    fus['email'] = contrib['email'] or fus['email']
-
-                    if contrib['type'] == 'new_content':
-                        fus['new_content_chars'] += contrib['ins_chars']
-                        fus['new_content_updates'] += 1
-                    elif contrib['type'] == 'rewriting':
-                        fus['rewriting_ins_chars'] += contrib['ins_chars']
-                        fus['rewriting_del_chars'] += contrib['del_chars']
-                        fus['rewriting_updates'] += 1
-                    elif contrib['type'] == 'deletion_only':
-                        fus['deletion_only_chars'] += contrib['del_chars']
-
-                success += 1
+            save_file_stats(conn, filename, per_user)
 
-            except Exception as e:
-                failed += 1
-                if args.verbose:
-                    print(f"    Error on v{from_v}-v{to_v}: {e}", file=sys.stderr)
-
-            if (i + 1) % 20 == 0:
-                print(f"    Processed {i+1}/{len(file_updates)}...", file=sys.stderr)
-
-        print(f"  Done: {success} successful, {failed} failed", file=sys.stderr)
+    diff_cache.close()
 
     # Generate report
     print("\nGenerating report...", file=sys.stderr)
-    report = generate_report(file_user_stats, target_files)
+    report = generate_report(conn, target_files)
+    conn.close()
 
     output_file = args.output or "contribution_report.md"
     with open(output_file, 'w') as f:
@@ -372,30 +1037,10 @@ def cmd_analyze(args):
     print(report)
 
 
-def generate_report(file_user_stats, target_files):
-    """Generate markdown report from analysis results."""
-
-    # Aggregate totals per user
-    user_totals = defaultdict(lambda: {
-        'name': None, 'email': None,
-        'new_content_chars': 0,
-        'new_content_updates': 0,
-        'rewriting_ins_chars': 0,
-        'rewriting_del_chars': 0,
-        'rewriting_updates': 0,
-        'files': {}
-    })
-
-    for filename, users in file_user_stats.items():
-        for user_id, stats in users.items():
-            user_totals[user_id]['name'] = stats['name'] or user_totals[user_id]['name']
-            user_totals[user_id]['email'] = stats['email'] or user_totals[user_id]['email']
-            user_totals[user_id]['new_content_chars'] += stats['new_content_chars']
-            user_totals[user_id]['new_content_updates'] += stats['new_content_updates']
-            user_totals[user_id]['rewriting_ins_chars'] += stats['rewriting_ins_chars']
-            user_totals[user_id]['rewriting_del_chars'] += stats['rewriting_del_chars']
-            user_totals[user_id]['rewriting_updates'] += stats['rewriting_updates']
-            user_totals[user_id]['files'][filename] = dict(stats)
+def generate_report(conn, target_files):
+    """Generate markdown report from the persisted stats database."""
+
+    placeholders = ', '.join('?' for _ in target_files)
 
     lines = []
     lines.append("# Overleaf Contribution Analysis")
@@ -421,12 +1066,18 @@ def generate_report(file_user_stats, target_files):
     lines.append("| Name | New Content (chars) | Rewriting +/- | Total Inserted | Original Draft % |")
     lines.append("|------|---------------------|---------------|----------------|------------------|")
 
-    for user_id, data in sorted(user_totals.items(),
-                                 key=lambda x: -(x[1]['new_content_chars'] + x[1]['rewriting_ins_chars'])):
-        name = data['name'] or user_id
-        new_chars = data['new_content_chars']
-        rewrite_ins = data['rewriting_ins_chars']
-        rewrite_del = data['rewriting_del_chars']
+    # Let SQLite do the per-user summing over whatever fits the target files
+    user_totals = conn.execute(f"""
+        SELECT user_id, MAX(name), SUM(new_content_chars),
+               SUM(rewriting_ins_chars), SUM(rewriting_del_chars)
+        FROM stats
+        WHERE filename IN ({placeholders})
+        GROUP BY user_id
+        ORDER BY SUM(new_content_chars) + SUM(rewriting_ins_chars) DESC
+    """, target_files)
+
+    for user_id, name, new_chars, rewrite_ins, rewrite_del in user_totals:
+        name = name or user_id
         total_ins = new_chars + rewrite_ins
 
         orig_pct = (new_chars / total_ins * 100) if total_ins > 0 else 0
@@ -445,8 +1096,18 @@ def generate_report(file_user_stats, target_files):
         lines.append(f"### {short_name}")
         lines.append("")
 
-        users = file_user_stats.get(filename, {})
-        if not users:
+        # Only the top 15 are shown; ORDER BY ... LIMIT does the selection
+        # inside SQLite
+        top_users = conn.execute("""
+            SELECT user_id, name, new_content_chars,
+                   rewriting_ins_chars, rewriting_del_chars
+            FROM stats
+            WHERE filename = ?
+            ORDER BY new_content_chars + rewriting_ins_chars DESC
+            LIMIT 15
+        """, (filename,)).fetchall()
+
+        if not top_users:
             lines.append("*No data available*")
             lines.append("")
             continue
@@ -454,12 +1115,8 @@ def generate_report(file_user_stats, target_files):
         lines.append("| Name | New Content | Rewriting +/- | Total Ins | Original % |")
         lines.append("|------|-------------|---------------|-----------|------------|")
 
-        for user_id, stats in sorted(users.items(),
-                                      key=lambda x: -(x[1]['new_content_chars'] + x[1]['rewriting_ins_chars']))[:15]:
-            name = stats['name'] or user_id
-            new_chars = stats['new_content_chars']
-            rewrite_ins = stats['rewriting_ins_chars']
-            rewrite_del = stats['rewriting_del_chars']
+        for user_id, name, new_chars, rewrite_ins, rewrite_del in top_users:
+            name = name or user_id
             total_ins = new_chars + rewrite_ins
 
             orig_pct = (new_chars / total_ins * 100) if total_ins > 0 else 0
@@ -499,7 +1156,7 @@ Examples:
     fetch_parser = subparsers.add_parser('fetch', help='Fetch project history')
     fetch_parser.add_argument('--project-id', required=True, help='Overleaf project ID (from URL)')
     fetch_parser.add_argument('--cookie', required=True, help='Session cookie')
-    fetch_parser.add_argument('--output', help='Output JSON file (default: overleaf_history_<id>.json)')
+    fetch_parser.add_argument('--output', help='Output NDJSON file (default: overleaf_history_<id>.ndjson)')
 
     # Analyze command
     analyze_parser = subparsers.add_parser('analyze', help='Detailed contribution analysis')